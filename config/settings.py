@@ -9,12 +9,21 @@ OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "<api key comes here>")
 OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 MODEL_NAME = "meta-llama/llama-4-maverick:free"
 
+# Incremental processing: minimum share of unchanged paragraphs needed to
+# process a re-scraped chapter paragraph by paragraph instead of in one call
+MIN_PARAGRAPH_REUSE_RATIO = 0.5
+
 # Paths
 RAW_CONTENT_DIR = BASE_DIR / "data" / "raw_content"
 PROCESSED_CONTENT_DIR = BASE_DIR / "data" / "processed_content"
 CHROMA_DB_DIR = BASE_DIR / "data" / "chroma_db"
+EXPORT_DIR = BASE_DIR / "data" / "exports"
+
+# Bulk export/import
+EXPORT_BATCH_SIZE = 500
 
 # Create directories if they don't exist
 RAW_CONTENT_DIR.mkdir(parents=True, exist_ok=True)
 PROCESSED_CONTENT_DIR.mkdir(parents=True, exist_ok=True)
 CHROMA_DB_DIR.mkdir(parents=True, exist_ok=True)
+EXPORT_DIR.mkdir(parents=True, exist_ok=True)
@@ -1,4 +1,5 @@
 import os
+import json
 from pathlib import Path
 from datetime import datetime
 from modules.scraper import WebScraper
@@ -6,7 +7,8 @@ from modules.ai_processor import AIProcessor
 from modules.human_interface import HumanInterface
 from modules.version_manager import VersionManager
 from modules.retrieval import ContentRetriever
-from config.settings import RAW_CONTENT_DIR, PROCESSED_CONTENT_DIR
+from modules.incremental import IncrementalProcessor
+from config.settings import RAW_CONTENT_DIR, PROCESSED_CONTENT_DIR, EXPORT_DIR
 
 class ContentRewriterApp:
     def __init__(self):
@@ -15,6 +17,7 @@ class ContentRewriterApp:
         self.human_interface = HumanInterface()
         self.version_manager = VersionManager()
         self.retriever = ContentRetriever()
+        self.incremental = IncrementalProcessor(self.version_manager)
 
     def run(self):
         """Main application loop."""
@@ -26,6 +29,8 @@ class ContentRewriterApp:
                     "Scrape and process new content",
                     "Continue processing existing content",
                     "Retrieve and view previous versions",
+                    "Export versions",
+                    "Import versions",
                     "Exit"
                 ]
             )
@@ -36,6 +41,10 @@ class ContentRewriterApp:
             elif choice == 3:
                 self.retrieve_versions()
             elif choice == 4:
+                self.export_versions()
+            elif choice == 5:
+                self.import_versions()
+            elif choice == 6:
                 print("Exiting the application.")
                 break
         self.scraper.close()
@@ -72,11 +81,27 @@ class ContentRewriterApp:
         self.ai_processing_workflow(scraped_data["content"], url, chapter_title, raw_version_id)
 
     def ai_processing_workflow(self, original_content, url, chapter_title, source_version_id):
-        """Handle the AI processing workflow."""
+        """
+        Handle the AI processing workflow.
+        When an earlier scrape of the chapter left reusable AI output, only
+        paragraphs that changed since then are sent to the AI.
+        """
         print("\nStarting AI processing...")
+        paragraph_hashes = self.incremental.hash_paragraphs(
+            self.incremental.split_paragraphs(original_content)
+        )
+        lineage = self.incremental.find_previous_lineage(url, chapter_title, source_version_id)
         # AI Rewriting
         print("\nAI is rewriting the content...")
-        ai_rewritten = self.ai_processor.rewrite_content(original_content)
+        ai_rewritten, rewritten_hashes, reused_rewritten = self.incremental.process_stage(
+            original_content,
+            paragraph_hashes,
+            lineage["AI_spun"],
+            self.ai_processor.rewrite_paragraph,
+            self.ai_processor.rewrite_content
+        )
+        if reused_rewritten:
+            print(f"Reused {reused_rewritten} of {len(paragraph_hashes)} rewritten paragraphs from the previous version.")
         if not ai_rewritten:
             print("AI rewriting failed.")
             return
@@ -87,13 +112,30 @@ class ContentRewriterApp:
             "stage": "AI_spun",
             "processed_by": "AI Writer",
             "source_version": source_version_id,
+            "reused_paragraphs": reused_rewritten,
             "timestamp": datetime.now().isoformat()
         }
+        if rewritten_hashes:
+            ai_metadata["paragraph_hashes"] = json.dumps(rewritten_hashes)
         ai_version_id = self.version_manager.store_version(ai_rewritten, ai_metadata)
         print(f"AI-rewritten content saved as version ID: {ai_version_id}")
         # AI Review
         print("\nAI is reviewing the rewritten content...")
-        ai_reviewed = self.ai_processor.review_content(ai_rewritten)
+        # Previous reviews only apply to paragraphs whose rewrite was reused as well
+        previous_reviewed = {}
+        if reused_rewritten:
+            previous_reviewed = {
+                h: p for h, p in lineage["AI_reviewed"].items() if h in lineage["AI_spun"]
+            }
+        ai_reviewed, reviewed_hashes, reused_reviewed = self.incremental.process_stage(
+            ai_rewritten,
+            rewritten_hashes,
+            previous_reviewed,
+            self.ai_processor.review_paragraph,
+            self.ai_processor.review_content
+        )
+        if reused_reviewed:
+            print(f"Reused {reused_reviewed} of {len(paragraph_hashes)} reviewed paragraphs from the previous version.")
         if not ai_reviewed:
             print("AI review failed.")
             return
@@ -104,8 +146,11 @@ class ContentRewriterApp:
             "stage": "AI_reviewed",
             "processed_by": "AI Reviewer",
             "source_version": ai_version_id,
+            "reused_paragraphs": reused_reviewed,
             "timestamp": datetime.now().isoformat()
         }
+        if reviewed_hashes:
+            reviewed_metadata["paragraph_hashes"] = json.dumps(reviewed_hashes)
         reviewed_version_id = self.version_manager.store_version(ai_reviewed, reviewed_metadata)
         print(f"AI-reviewed content saved as version ID: {reviewed_version_id}")
         # Show differences
@@ -325,6 +370,43 @@ class ContentRewriterApp:
                 )
                 print(f"\nNew version saved as ID: {new_version_id}")
 
+    def export_versions(self):
+        """Export stored versions to a compressed JSONL file."""
+        default_path = EXPORT_DIR / f"versions_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl.gz"
+        path = self.human_interface.get_human_input("Export file (.gz or .zst)", str(default_path))
+        stage = self.human_interface.get_human_input("Filter by stage (leave blank for all)").strip()
+        url = self.human_interface.get_human_input("Filter by original URL (leave blank for all)").strip()
+        since = self.human_interface.get_human_input("Only versions since (YYYY-MM-DD or ISO timestamp, leave blank for all)").strip()
+        until = self.human_interface.get_human_input("Only versions until (YYYY-MM-DD or ISO timestamp, leave blank for all)").strip()
+        include_embeddings = self.human_interface.get_human_input("Include embeddings? (y/n)", "n").lower() == 'y'
+        try:
+            count = self.version_manager.export_versions(
+                path,
+                include_embeddings=include_embeddings,
+                stage=stage or None,
+                original_url=url or None,
+                since=since or None,
+                until=until or None
+            )
+        except Exception as e:
+            print(f"Export failed: {e}")
+            return
+        print(f"\nExported {count} versions to {path}")
+
+    def import_versions(self):
+        """Import versions from a compressed JSONL export."""
+        path = self.human_interface.get_human_input("Import file (.gz or .zst)").strip()
+        if not os.path.exists(path):
+            print("File not found.")
+            return
+        reembed = self.human_interface.get_human_input("Re-embed content instead of using stored embeddings? Slower, the import waits for it (y/n)", "n").lower() == 'y'
+        try:
+            count = self.version_manager.import_versions(path, reembed=reembed)
+        except Exception as e:
+            print(f"Import failed: {e}")
+            return
+        print(f"\nImported {count} versions from {path}")
+
 if __name__ == "__main__":
     app = ContentRewriterApp()
     app.run()
@@ -41,6 +41,34 @@ class AIProcessor:
         response = self._get_ai_response(prompt)
         return response
 
+    def rewrite_paragraph(self, paragraph):
+        """Use AI to rewrite a single paragraph of a larger text."""
+        prompt = f"""
+        Please rewrite the following paragraph while preserving its core meaning and style.
+        Improve clarity and flow where needed, without adding or removing information.
+        Reply with the rewritten paragraph only, as a single paragraph,
+        with no introduction, notes or commentary.
+        
+        Paragraph:
+        {paragraph}
+        """
+        response = self._get_ai_response(prompt)
+        return response
+
+    def review_paragraph(self, paragraph):
+        """Use AI to review and correct a single paragraph of a larger text."""
+        prompt = f"""
+        Please review the following paragraph and return an improved version:
+        fix grammatical errors, improve clarity and keep the style and tone consistent.
+        Reply with the corrected paragraph only, as a single paragraph,
+        with no introduction, notes or commentary.
+        
+        Paragraph:
+        {paragraph}
+        """
+        response = self._get_ai_response(prompt)
+        return response
+
     def _get_ai_response(self, prompt):
         """Get response from the AI model with error handling."""
         try:
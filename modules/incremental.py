@@ -0,0 +1,197 @@
+import hashlib
+import json
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+from config.settings import MIN_PARAGRAPH_REUSE_RATIO
+
+PARAGRAPH_SEPARATOR = "\n\n"
+# Lead-in lines models add before the actual answer, e.g. "Here is the rewritten version:"
+PREAMBLE_PATTERN = re.compile(
+    r"^\s*((here is|here's|below is|sure|certainly|of course)\b[^\n]*"
+    r"|[^\n]{0,60}\b(version|rewrite|paragraph)\b[^\n]{0,20}):\s*(\n|$)",
+    re.IGNORECASE
+)
+# Closing remarks models append after the answer, e.g. "Changes made:" or "Note: ..."
+TRAILER_PATTERN = re.compile(
+    r"^(notes?|changes( made)?|key changes|improvements( made)?|summary of changes)\b[^\n]*:"
+    r"|^i('ve| have)? made the following\b",
+    re.IGNORECASE
+)
+SEPARATOR_PATTERN = re.compile(r"^[-*_=\s]{3,}$")
+# Bound on the length ratio between a source paragraph and its processed
+# counterpart for the two to be considered aligned
+MAX_PARAGRAPH_LENGTH_RATIO = 2.5
+
+class IncrementalProcessor:
+    """
+    Reuse AI output from a previous lineage of the same chapter.
+
+    Each raw paragraph is hashed; paragraphs whose hash appears in the
+    previous AI_spun/AI_reviewed versions are copied over, and only the
+    remaining paragraphs are sent to the AI processor.
+    """
+
+    def __init__(self, version_manager):
+        self.version_manager = version_manager
+
+    @staticmethod
+    def split_paragraphs(text: str) -> List[str]:
+        """Split text on blank lines, dropping empty paragraphs."""
+        return [p.strip() for p in re.split(r"\n\s*\n", text or "") if p.strip()]
+
+    @staticmethod
+    def join_paragraphs(paragraphs: List[str]) -> str:
+        """Join paragraphs back into a single text."""
+        return PARAGRAPH_SEPARATOR.join(paragraphs)
+
+    @staticmethod
+    def hash_paragraph(paragraph: str) -> str:
+        """Hash a paragraph, ignoring differences in whitespace."""
+        normalized = " ".join(paragraph.split())
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def hash_paragraphs(self, paragraphs: List[str]) -> List[str]:
+        return [self.hash_paragraph(p) for p in paragraphs]
+
+    def aligned_hashes(self, source_text: str, processed_text: str) -> Optional[List[str]]:
+        """
+        Return the source paragraph hashes if each processed paragraph
+        plausibly corresponds to the source paragraph at the same position,
+        otherwise None.
+        """
+        source_paragraphs = self.split_paragraphs(source_text)
+        processed_paragraphs = self.split_paragraphs(processed_text)
+        if not source_paragraphs or len(source_paragraphs) != len(processed_paragraphs):
+            return None
+        for source, processed in zip(source_paragraphs, processed_paragraphs):
+            ratio = max(len(source), len(processed)) / max(1, min(len(source), len(processed)))
+            if ratio > MAX_PARAGRAPH_LENGTH_RATIO:
+                return None
+        return self.hash_paragraphs(source_paragraphs)
+
+    @staticmethod
+    def worth_reusing(hashes: List[str], previous: Dict[str, str]) -> bool:
+        """
+        Whether enough paragraphs can be reused to beat a single
+        whole-chapter AI call.
+        """
+        if not hashes or not previous:
+            return False
+        reusable = sum(1 for h in hashes if h in previous)
+        return reusable / len(hashes) >= MIN_PARAGRAPH_REUSE_RATIO
+
+    def process_stage(
+        self,
+        source_text: str,
+        hashes: Optional[List[str]],
+        previous: Dict[str, str],
+        paragraph_fn: Callable[[str], Optional[str]],
+        full_fn: Callable[[str], Optional[str]]
+    ) -> Tuple[Optional[str], Optional[List[str]], int]:
+        """
+        Run one AI stage over source_text, whose paragraphs are keyed by the
+        raw paragraph hashes in hashes (None if unknown).
+        Changed paragraphs go through paragraph_fn when enough of the previous
+        output can be reused; otherwise the whole text goes through full_fn.
+        Returns (processed text, hashes aligned with it or None, reused count);
+        processed text is None if an AI call failed.
+        """
+        paragraphs = self.split_paragraphs(source_text)
+        if hashes and len(hashes) == len(paragraphs) and self.worth_reusing(hashes, previous):
+            processed, reused = self.process_paragraphs(paragraphs, hashes, previous, paragraph_fn)
+            if processed is None:
+                return None, None, reused
+            return self.join_paragraphs(processed), hashes, reused
+        result = self.clean_response(full_fn(source_text) or "")
+        if not result:
+            return None, None, 0
+        aligned = hashes if hashes and self.aligned_hashes(source_text, result) else None
+        return result, aligned, 0
+
+    def find_previous_lineage(
+        self,
+        original_url: str,
+        chapter_title: str,
+        exclude_version_id: Optional[str] = None
+    ) -> Dict[str, Dict[str, str]]:
+        """
+        Build per-stage lookup tables (raw paragraph hash -> processed
+        paragraph) from the newest earlier raw version of the chapter whose
+        derived versions carry paragraph hashes. A raw version with both
+        AI_spun and AI_reviewed lookups is preferred over one with AI_spun only.
+        """
+        fallback = None
+        for raw in self.version_manager.get_raw_versions(original_url, chapter_title):
+            if raw["id"] == exclude_version_id:
+                continue
+            ai_spun = self.version_manager.get_derived_version(raw["id"], "AI_spun")
+            spun_lookup = self._paragraph_lookup(ai_spun)
+            if not spun_lookup:
+                continue
+            ai_reviewed = self.version_manager.get_derived_version(ai_spun["id"], "AI_reviewed")
+            reviewed_lookup = self._paragraph_lookup(ai_reviewed)
+            lineage = {"AI_spun": spun_lookup, "AI_reviewed": reviewed_lookup}
+            if reviewed_lookup:
+                return lineage
+            if fallback is None:
+                fallback = lineage
+        return fallback or {"AI_spun": {}, "AI_reviewed": {}}
+
+    def process_paragraphs(
+        self,
+        paragraphs: List[str],
+        hashes: List[str],
+        previous: Dict[str, str],
+        process_fn: Callable[[str], Optional[str]]
+    ) -> Tuple[Optional[List[str]], int]:
+        """
+        Process paragraphs one by one, reusing previous output for
+        unchanged hashes. Returns (processed paragraphs, reused count);
+        processed paragraphs is None if any AI call failed.
+        """
+        processed = []
+        reused = 0
+        for paragraph, paragraph_hash in zip(paragraphs, hashes):
+            if paragraph_hash in previous:
+                processed.append(previous[paragraph_hash])
+                reused += 1
+                continue
+            result = self.clean_paragraph(process_fn(paragraph) or "")
+            if not result:
+                return None, reused
+            processed.append(result)
+        return processed, reused
+
+    @classmethod
+    def clean_response(cls, text: str) -> str:
+        """Strip a leading preamble and trailing notes from an AI response."""
+        text = PREAMBLE_PATTERN.sub("", (text or "").strip(), count=1)
+        paragraphs = cls.split_paragraphs(text)
+        for i, paragraph in enumerate(paragraphs[1:], 1):
+            if TRAILER_PATTERN.match(paragraph):
+                paragraphs = paragraphs[:i]
+                break
+        while paragraphs and SEPARATOR_PATTERN.match(paragraphs[-1]):
+            paragraphs.pop()
+        return cls.join_paragraphs(paragraphs)
+
+    @classmethod
+    def clean_paragraph(cls, text: str) -> str:
+        """
+        Clean an AI response to a single paragraph and collapse blank
+        lines so it stays one paragraph.
+        """
+        return re.sub(r"\n\s*\n", "\n", cls.clean_response(text))
+
+    def _paragraph_lookup(self, version: Optional[Dict]) -> Dict[str, str]:
+        """Map raw paragraph hashes to the paragraphs of a processed version."""
+        if not version:
+            return {}
+        try:
+            hashes = json.loads(version["metadata"].get("paragraph_hashes", ""))
+        except (TypeError, ValueError):
+            return {}
+        paragraphs = self.split_paragraphs(version["content"])
+        if not isinstance(hashes, list) or len(hashes) != len(paragraphs):
+            return {}
+        return dict(zip(hashes, paragraphs))
@@ -1,13 +1,26 @@
 import chromadb
-from datetime import datetime
-from config.settings import CHROMA_DB_DIR
-from typing import Dict, List, Optional
+import gzip
+import io
+import json
+import os
+import queue
+import re
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from config.settings import CHROMA_DB_DIR, EXPORT_BATCH_SIZE
+from typing import Dict, Iterator, List, Optional
 import uuid
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 class VersionManager:
-    def __init__(self):
+    def __init__(self, db_path=CHROMA_DB_DIR):
         # Initialize ChromaDB persistent client (new API)
-        self.client = chromadb.PersistentClient(path=str(CHROMA_DB_DIR))
+        self.client = chromadb.PersistentClient(path=str(db_path))
         # Create or get the collection
         self.collection = self.client.get_or_create_collection("content_versions")
 
@@ -61,20 +74,235 @@ class VersionManager:
     def get_latest_version(self, original_url: str) -> Optional[Dict]:
         """Get the most recent version for a given original URL."""
         try:
-            # Get all versions for this URL, sorted by timestamp
-            versions = self.get_versions_by_metadata({"original_url": original_url})
-            if not versions:
-                return None
-            # Sort by timestamp (newest first)
-            versions.sort(
-                key=lambda v: v["metadata"].get("timestamp", ""),
-                reverse=True
+            versions = self._sort_newest_first(
+                self.get_versions_by_metadata({"original_url": original_url})
             )
-            return versions[0]
+            return versions[0] if versions else None
         except Exception as e:
             print(f"Error getting latest version: {e}")
             return None
 
+    def get_raw_versions(self, original_url: str, chapter_title: str) -> List[Dict]:
+        """Get all raw versions for a given URL and chapter, newest first."""
+        return self._sort_newest_first(self.get_versions_by_metadata({
+            "$and": [
+                {"original_url": original_url},
+                {"chapter_title": chapter_title},
+                {"stage": "raw"}
+            ]
+        }))
+
+    def get_derived_version(self, source_version_id: str, stage: str) -> Optional[Dict]:
+        """Get the most recent version of a stage derived from a source version."""
+        versions = self._sort_newest_first(self.get_versions_by_metadata({
+            "$and": [
+                {"source_version": source_version_id},
+                {"stage": stage}
+            ]
+        }))
+        return versions[0] if versions else None
+
+    @staticmethod
+    def _sort_newest_first(versions: List[Dict]) -> List[Dict]:
+        """Sort versions by timestamp, newest first."""
+        versions.sort(
+            key=lambda v: v["metadata"].get("timestamp", ""),
+            reverse=True
+        )
+        return versions
+
     def get_final_versions(self) -> List[Dict]:
         """Get all versions marked as 'final'."""
-        return self.get_versions_by_metadata({"stage": "final"}) 
\ No newline at end of file
+        return self.get_versions_by_metadata({"stage": "final"}) 
+
+    def export_versions(
+        self,
+        path,
+        include_embeddings: bool = False,
+        stage: Optional[str] = None,
+        original_url: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        batch_size: int = EXPORT_BATCH_SIZE
+    ) -> int:
+        """
+        Stream versions to a compressed JSONL file, one version per line.
+        The compression (.gz or .zst) is picked from the file extension.
+        since/until are ISO dates or timestamps; a date-only until covers
+        the whole day. The file is only put in place once fully written.
+        Returns the number of exported versions.
+        """
+        path = Path(path)
+        compression = self._compression_for(path)
+        since_dt = self._parse_timestamp(since, "since") if since else None
+        until_dt = self._parse_timestamp(until, "until") if until else None
+        if until_dt:
+            # Make the bound exclusive; a date-only until covers the whole day
+            until_dt += timedelta(days=1) if self._is_date_only(until) else timedelta(microseconds=1)
+        metadata_filter = {}
+        if stage:
+            metadata_filter["stage"] = stage
+        if original_url:
+            metadata_filter["original_url"] = original_url
+        if len(metadata_filter) > 1:
+            metadata_filter = {"$and": [{k: v} for k, v in metadata_filter.items()]}
+        include = ["documents", "metadatas"]
+        if include_embeddings:
+            include.append("embeddings")
+        count = 0
+        temp_path = path.with_name(f".{path.name}.partial")
+        try:
+            with self._open_compressed(temp_path, "w", compression) as f:
+                offset = 0
+                while True:
+                    results = self.collection.get(
+                        where=metadata_filter or None,
+                        include=include,
+                        limit=batch_size,
+                        offset=offset
+                    )
+                    ids = results["ids"]
+                    if not ids:
+                        break
+                    for i in range(len(ids)):
+                        metadata = results["metadatas"][i] or {}
+                        if since_dt or until_dt:
+                            try:
+                                timestamp = self._parse_timestamp(metadata.get("timestamp", ""), "timestamp")
+                            except ValueError:
+                                continue
+                            if since_dt and timestamp < since_dt:
+                                continue
+                            if until_dt and timestamp >= until_dt:
+                                continue
+                        record = {
+                            "id": ids[i],
+                            "content": results["documents"][i],
+                            "metadata": metadata
+                        }
+                        if include_embeddings and results.get("embeddings") is not None:
+                            record["embedding"] = [float(x) for x in results["embeddings"][i]]
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        count += 1
+                    offset += len(ids)
+            os.replace(temp_path, path)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+        return count
+
+    def import_versions(
+        self,
+        path,
+        reembed: bool = False,
+        batch_size: int = EXPORT_BATCH_SIZE
+    ) -> int:
+        """
+        Load versions from a compressed JSONL export in batches.
+        Stored embeddings are reused unless reembed is set (or the export has
+        none), in which case the collection computes them. Writes happen on a
+        helper thread so reading the file overlaps with embedding, but the
+        call only returns once every batch is written and embedded.
+        Existing versions with the same ID are overwritten.
+        Returns the number of imported versions.
+        """
+        batches = queue.Queue(maxsize=2)
+        errors = []
+
+        def writer():
+            while True:
+                batch = batches.get()
+                if batch is None:
+                    return
+                if errors:
+                    continue
+                try:
+                    self._write_batch(batch, reembed)
+                except Exception as e:
+                    errors.append(e)
+
+        worker = threading.Thread(target=writer, daemon=True)
+        worker.start()
+        count = 0
+        try:
+            for batch in self._read_batches(path, batch_size):
+                if errors:
+                    break
+                batches.put(batch)
+                count += len(batch)
+        finally:
+            batches.put(None)
+            worker.join()
+        if errors:
+            raise errors[0]
+        return count
+
+    def _write_batch(self, batch: List[Dict], reembed: bool):
+        """Upsert a batch of exported records into the collection."""
+        kwargs = {
+            "ids": [r["id"] for r in batch],
+            "documents": [r["content"] for r in batch],
+            "metadatas": [r["metadata"] for r in batch]
+        }
+        if not reembed and all("embedding" in r for r in batch):
+            kwargs["embeddings"] = [r["embedding"] for r in batch]
+        self.collection.upsert(**kwargs)
+
+    def _read_batches(self, path, batch_size: int) -> Iterator[List[Dict]]:
+        """Yield lists of records from a compressed JSONL export."""
+        batch = []
+        with self._open_compressed(path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                batch.append(json.loads(line))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _parse_timestamp(value: str, label: str) -> datetime:
+        """Parse an ISO date or timestamp into a naive local datetime."""
+        try:
+            parsed = datetime.fromisoformat(value.strip())
+        except (AttributeError, ValueError):
+            raise ValueError(f"Invalid {label} date: {value!r} (expected YYYY-MM-DD or an ISO timestamp)")
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone().replace(tzinfo=None)
+        return parsed
+
+    @staticmethod
+    def _is_date_only(value: str) -> bool:
+        return re.fullmatch(r"\d{4}-?\d{2}-?\d{2}", value.strip()) is not None
+
+    @staticmethod
+    def _compression_for(path) -> str:
+        """Pick the compression format from the file extension."""
+        suffix = Path(path).suffix
+        if suffix == ".zst":
+            if zstandard is None:
+                raise RuntimeError("zstandard is not installed; use a .gz file or pip install zstandard")
+            return "zst"
+        if suffix == ".gz":
+            return "gz"
+        raise ValueError(f"Unsupported export format: {Path(path).name} (expected .gz or .zst)")
+
+    @classmethod
+    def _open_compressed(cls, path, mode: str, compression: Optional[str] = None):
+        """Open a .gz or .zst file as text for reading ("r") or writing ("w")."""
+        compression = compression or cls._compression_for(path)
+        if compression == "zst":
+            if zstandard is None:
+                raise RuntimeError("zstandard is not installed; use a .gz file or pip install zstandard")
+            if mode == "w":
+                stream = zstandard.ZstdCompressor().stream_writer(open(path, "wb"), closefd=True)
+            else:
+                stream = zstandard.ZstdDecompressor().stream_reader(
+                    open(path, "rb"),
+                    read_across_frames=True,
+                    closefd=True
+                )
+            return io.TextIOWrapper(stream, encoding="utf-8")
+        return gzip.open(path, mode + "t", encoding="utf-8")
@@ -0,0 +1,198 @@
+import json
+from modules.incremental import IncrementalProcessor
+
+RAW = "First paragraph.\n\nSecond paragraph.\n\nThird paragraph."
+
+
+class FakeVersionManager:
+    """In-memory stand-in for the lineage lookups of VersionManager."""
+
+    def __init__(self):
+        self.raw_versions = []
+        self.derived = {}
+
+    def add_raw(self, version_id, content):
+        # Newest first, as VersionManager.get_raw_versions returns them
+        self.raw_versions.insert(0, {"id": version_id, "content": content, "metadata": {"stage": "raw"}})
+
+    def add_derived(self, source_id, stage, version_id, content, hashes=None):
+        metadata = {"stage": stage, "source_version": source_id}
+        if hashes is not None:
+            metadata["paragraph_hashes"] = json.dumps(hashes)
+        self.derived[(source_id, stage)] = {"id": version_id, "content": content, "metadata": metadata}
+
+    def get_raw_versions(self, original_url, chapter_title):
+        return list(self.raw_versions)
+
+    def get_derived_version(self, source_version_id, stage):
+        return self.derived.get((source_version_id, stage))
+
+
+def make_lineage(vm, raw_id, hashes, reviewed=True):
+    vm.add_raw(raw_id, RAW)
+    vm.add_derived(raw_id, "AI_spun", f"{raw_id}-spun", "A1\n\nA2\n\nA3", hashes)
+    if reviewed:
+        vm.add_derived(f"{raw_id}-spun", "AI_reviewed", f"{raw_id}-rev", "R1\n\nR2\n\nR3", hashes)
+
+
+def test_one_changed_paragraph_makes_one_call():
+    vm = FakeVersionManager()
+    processor = IncrementalProcessor(vm)
+    make_lineage(vm, "raw-1", processor.hash_paragraphs(processor.split_paragraphs(RAW)))
+    lineage = processor.find_previous_lineage("url", "Chapter 1", exclude_version_id="raw-2")
+
+    new_raw = "First paragraph.\n\nSecond  paragraph, fixed.\n\nThird   paragraph."
+    paragraphs = processor.split_paragraphs(new_raw)
+    hashes = processor.hash_paragraphs(paragraphs)
+    calls = []
+
+    def rewrite(paragraph):
+        calls.append(paragraph)
+        return "Here is the rewritten paragraph:\nNEW"
+
+    assert processor.worth_reusing(hashes, lineage["AI_spun"])
+    result, reused = processor.process_paragraphs(paragraphs, hashes, lineage["AI_spun"], rewrite)
+    assert calls == ["Second  paragraph, fixed."]
+    assert reused == 2
+    assert result == ["A1", "NEW", "A3"]
+
+
+def test_failed_ai_call_returns_none():
+    processor = IncrementalProcessor(FakeVersionManager())
+    paragraphs = ["one", "two"]
+    hashes = processor.hash_paragraphs(paragraphs)
+    result, _ = processor.process_paragraphs(paragraphs, hashes, {}, lambda p: None)
+    assert result is None
+
+
+def test_missing_paragraph_hashes_gives_empty_lineage():
+    vm = FakeVersionManager()
+    processor = IncrementalProcessor(vm)
+    make_lineage(vm, "raw-1", hashes=None)
+    lineage = processor.find_previous_lineage("url", "Chapter 1")
+    assert lineage == {"AI_spun": {}, "AI_reviewed": {}}
+    assert not processor.worth_reusing(processor.hash_paragraphs(["x"]), lineage["AI_spun"])
+
+
+def test_misaligned_paragraph_hashes_gives_empty_lineage():
+    vm = FakeVersionManager()
+    processor = IncrementalProcessor(vm)
+    make_lineage(vm, "raw-1", hashes=["only-one-hash"])
+    assert processor.find_previous_lineage("url", "Chapter 1")["AI_spun"] == {}
+
+
+def test_walks_back_past_incomplete_lineage():
+    vm = FakeVersionManager()
+    processor = IncrementalProcessor(vm)
+    hashes = processor.hash_paragraphs(processor.split_paragraphs(RAW))
+    make_lineage(vm, "raw-1", hashes)
+    # Newer scrape whose processing stopped before review
+    make_lineage(vm, "raw-2", hashes, reviewed=False)
+    # Newest scrape whose processing never got to a rewrite
+    vm.add_raw("raw-3", RAW)
+    lineage = processor.find_previous_lineage("url", "Chapter 1", exclude_version_id="raw-4")
+    assert lineage["AI_reviewed"][hashes[0]] == "R1"
+
+
+def test_few_reusable_paragraphs_falls_back_to_full_call():
+    processor = IncrementalProcessor(FakeVersionManager())
+    hashes = processor.hash_paragraphs(["a", "b", "c", "d"])
+    assert not processor.worth_reusing(hashes, {hashes[0]: "A"})
+    assert processor.worth_reusing(hashes, {hashes[0]: "A", hashes[1]: "B"})
+
+
+def test_clean_paragraph_strips_preamble():
+    text = "Here is the rewritten version:\n\nA\n\nB"
+    assert IncrementalProcessor.clean_paragraph(text) == "A\nB"
+    assert IncrementalProcessor.clean_paragraph("Plain text: kept") == "Plain text: kept"
+
+
+class StoringVersionManager:
+    """In-memory VersionManager covering what ai_processing_workflow uses."""
+
+    def __init__(self):
+        self.versions = []
+
+    def store_version(self, content, metadata):
+        version_id = f"v{len(self.versions)}"
+        self.versions.append({"id": version_id, "content": content, "metadata": dict(metadata)})
+        return version_id
+
+    def get_raw_versions(self, original_url, chapter_title):
+        return [v for v in reversed(self.versions) if v["metadata"]["stage"] == "raw"]
+
+    def get_derived_version(self, source_version_id, stage):
+        for v in reversed(self.versions):
+            if v["metadata"].get("source_version") == source_version_id and v["metadata"]["stage"] == stage:
+                return v
+        return None
+
+
+class FakeAIProcessor:
+    """Answers like a chatty model: preambles and trailing notes included."""
+
+    def __init__(self):
+        self.calls = []
+
+    def rewrite_content(self, text):
+        self.calls.append(("rewrite_content", text))
+        body = "\n\n".join(p.upper() for p in IncrementalProcessor.split_paragraphs(text))
+        return f"Here is the rewritten version:\n\n{body}\n\nChanges made:\n- clearer wording"
+
+    def review_content(self, text):
+        self.calls.append(("review_content", text))
+        body = "\n\n".join(p + " (reviewed)" for p in IncrementalProcessor.split_paragraphs(text))
+        return f"Reviewed Version with Improvements:\n\n{body}\n\n---\n\nNote: only minor fixes."
+
+    def rewrite_paragraph(self, paragraph):
+        self.calls.append(("rewrite_paragraph", paragraph))
+        return f"Sure, here's the rewritten paragraph:\n{paragraph.upper()}"
+
+    def review_paragraph(self, paragraph):
+        self.calls.append(("review_paragraph", paragraph))
+        return paragraph + " (reviewed)"
+
+
+def run_workflow(app, content):
+    raw_id = app.version_manager.store_version(content, {"stage": "raw", "original_url": "url", "chapter_title": "Chapter 1"})
+    app.ai_processor.calls.clear()
+    app.ai_processing_workflow(content, "url", "Chapter 1", raw_id)
+    return app.version_manager.versions[-1]
+
+
+def test_typo_fix_after_whole_chapter_pass_costs_one_paragraph(monkeypatch):
+    from main import ContentRewriterApp
+    app = ContentRewriterApp.__new__(ContentRewriterApp)
+    app.version_manager = StoringVersionManager()
+    app.ai_processor = FakeAIProcessor()
+    app.incremental = IncrementalProcessor(app.version_manager)
+    app.human_interface = type("Quiet", (), {"display_content_differences": staticmethod(lambda *a: None)})()
+    monkeypatch.setattr(app, "human_review_workflow", lambda *args: None, raising=False)
+
+    chapter = "\n\n".join(f"Paragraph number {i} of the chapter." for i in range(6))
+    first = run_workflow(app, chapter)
+    assert [name for name, _ in app.ai_processor.calls] == ["rewrite_content", "review_content"]
+    assert first["metadata"]["stage"] == "AI_reviewed"
+    assert "paragraph_hashes" in first["metadata"]
+    assert not first["content"].startswith("Reviewed")
+
+    fixed = chapter.replace("number 3", "numbr 3")
+    second = run_workflow(app, fixed)
+    assert app.ai_processor.calls == [
+        ("rewrite_paragraph", "Paragraph numbr 3 of the chapter."),
+        ("review_paragraph", "PARAGRAPH NUMBR 3 OF THE CHAPTER."),
+    ]
+    assert second["metadata"]["reused_paragraphs"] == 5
+    paragraphs = IncrementalProcessor.split_paragraphs(second["content"])
+    assert paragraphs[3] == "PARAGRAPH NUMBR 3 OF THE CHAPTER. (reviewed)"
+    assert paragraphs[0] == "PARAGRAPH NUMBER 0 OF THE CHAPTER. (reviewed)"
+
+
+def test_merged_paragraphs_are_not_aligned():
+    processor = IncrementalProcessor(FakeVersionManager())
+    answer = processor.clean_response("Here is the rewritten version:\n\nA2. B2.\n\nC2.")
+    assert processor.aligned_hashes("A a.\n\nB b.\n\nC c.", answer) is None
+    # Same count, but the second paragraph clearly holds two merged ones
+    source = "Short one.\n\nAnother short one.\n\nA third, much longer paragraph of narration."
+    merged = "Short one.\n\nAnother short one. A third, much longer paragraph of narration.\n\nAn invented line."
+    assert processor.aligned_hashes(source, merged) is None
@@ -0,0 +1,153 @@
+import gzip
+import json
+import threading
+import pytest
+from chromadb.api.types import EmbeddingFunction
+from modules.version_manager import VersionManager
+
+
+class FakeEmbedding(EmbeddingFunction):
+    """Deterministic embeddings so tests don't download a model."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, input):
+        self.calls += 1
+        return [[float(len(doc)), 1.0, 0.0] for doc in input]
+
+    @staticmethod
+    def name():
+        return "fake"
+
+    def get_config(self):
+        return {}
+
+
+def make_manager(path, embedding=None):
+    vm = VersionManager(db_path=path)
+    vm.collection = vm.client.get_or_create_collection(
+        "test_versions",
+        embedding_function=embedding or FakeEmbedding()
+    )
+    return vm
+
+
+@pytest.fixture
+def manager(tmp_path):
+    vm = make_manager(tmp_path / "source")
+    for i in range(7):
+        vm.collection.add(
+            ids=[f"v{i}"],
+            documents=[f"content {i}"],
+            metadatas=[{
+                "original_url": "https://a" if i < 4 else "https://b",
+                "stage": "raw" if i % 2 else "final",
+                "timestamp": f"2026-10-{10 + i}T05:53:33.123456"
+            }]
+        )
+    return vm
+
+
+@pytest.mark.parametrize("suffix", [".jsonl.gz", ".jsonl.zst"])
+def test_round_trip_across_batches(manager, tmp_path, suffix):
+    path = tmp_path / f"export{suffix}"
+    assert manager.export_versions(path, include_embeddings=True, batch_size=3) == 7
+    assert not (tmp_path / f".{path.name}.partial").exists()
+    embedding = FakeEmbedding()
+    target = make_manager(tmp_path / "target", embedding)
+    assert target.import_versions(path, batch_size=2) == 7
+    assert embedding.calls == 0
+    result = target.collection.get(ids=["v5"], include=["documents", "metadatas", "embeddings"])
+    assert result["documents"] == ["content 5"]
+    assert result["metadatas"][0]["stage"] == "raw"
+    assert list(result["embeddings"][0]) == [9.0, 1.0, 0.0]
+
+
+def test_import_reembeds_without_stored_embeddings(manager, tmp_path):
+    path = tmp_path / "export.jsonl.gz"
+    manager.export_versions(path, batch_size=2)
+    embedding = FakeEmbedding()
+    target = make_manager(tmp_path / "target", embedding)
+    assert target.import_versions(path, batch_size=3) == 7
+    assert embedding.calls == 3
+    assert target.collection.count() == 7
+
+
+def exported_ids(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return sorted(json.loads(line)["id"] for line in f)
+
+
+def test_filter_combinations(manager, tmp_path):
+    path = tmp_path / "export.jsonl.gz"
+    manager.export_versions(path, stage="raw", batch_size=2)
+    assert exported_ids(path) == ["v1", "v3", "v5"]
+    manager.export_versions(path, stage="raw", original_url="https://a", batch_size=2)
+    assert exported_ids(path) == ["v1", "v3"]
+    manager.export_versions(path, since="2026-10-12", until="2026-10-14", batch_size=2)
+    assert exported_ids(path) == ["v2", "v3", "v4"]
+    manager.export_versions(path, until="2026-10-11T00:00:00", batch_size=2)
+    assert exported_ids(path) == ["v0"]
+
+
+def test_invalid_date_is_rejected(manager, tmp_path):
+    path = tmp_path / "export.jsonl.gz"
+    with pytest.raises(ValueError):
+        manager.export_versions(path, since="yesterday")
+    assert not path.exists()
+
+
+def test_failed_export_leaves_no_file(manager, tmp_path, monkeypatch):
+    path = tmp_path / "export.jsonl.gz"
+    original_get = manager.collection.get
+    calls = []
+
+    def failing_get(**kwargs):
+        calls.append(kwargs)
+        if len(calls) > 1:
+            raise RuntimeError("boom")
+        return original_get(**kwargs)
+
+    monkeypatch.setattr(manager.collection, "get", failing_get)
+    with pytest.raises(RuntimeError):
+        manager.export_versions(path, batch_size=2)
+    assert not path.exists()
+    assert not (tmp_path / f".{path.name}.partial").exists()
+
+
+def test_import_writer_error_is_raised(manager, tmp_path, monkeypatch):
+    path = tmp_path / "export.jsonl.gz"
+    manager.export_versions(path)
+    target = make_manager(tmp_path / "target")
+    original_upsert = target.collection.upsert
+    calls = []
+
+    def failing_upsert(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 2:
+            raise RuntimeError("write failed")
+        return original_upsert(**kwargs)
+
+    monkeypatch.setattr(target.collection, "upsert", failing_upsert)
+    threads_before = threading.active_count()
+    with pytest.raises(RuntimeError, match="write failed"):
+        target.import_versions(path, batch_size=1)
+    # The writer thread has drained the queue and exited
+    assert threading.active_count() == threads_before
+    assert len(calls) == 2
+    assert target.collection.count() == 1
+
+
+def test_import_reads_every_zstd_frame(manager, tmp_path):
+    pytest.importorskip("zstandard")
+    first = tmp_path / "first.jsonl.zst"
+    second = tmp_path / "second.jsonl.zst"
+    manager.export_versions(first, stage="raw")
+    manager.export_versions(second, stage="final")
+    # Concatenated files give one frame per file, like pzstd output
+    joined = tmp_path / "joined.jsonl.zst"
+    joined.write_bytes(first.read_bytes() + second.read_bytes())
+    target = make_manager(tmp_path / "target")
+    assert target.import_versions(joined, batch_size=2) == 7
+    assert target.collection.count() == 7